@@ -0,0 +1,248 @@
+"""Throughput and peak-memory benchmarks for the forensic parsers.
+
+    python -m benchmarks.corpus                       # once, writes benchmarks/corpus/
+    python -m benchmarks.bench_parsers [--by-category] [--save NAME] [--compare NAME]
+
+Each analyzer runs over every corpus file twice: once for wall-clock time
+(MB/s of input, files/s) and once under tracemalloc for peak Python-heap
+memory. Mapped file pages and zlib's internal state are not on the Python
+heap, so the memory column shows what the analyzer itself allocates.
+
+Baselines are JSON files in benchmarks/baselines/. --compare prints the
+change against one and, with --fail-on-regression, exits non-zero when an
+analyzer is slower than the allowed tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.corpus import DEFAULT_OUT
+from carve import carve
+from decompress_idat import (IdatInflater, InflateError, extract_strings, process_png,
+                             search_idat)
+from inspect_png_chunks import parse_png
+from keywords import KeywordMatcher
+from png_chunks import iter_chunks, map_file, walk_png
+from png_metadata import format_entry, read_metadata
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def _chunks(path, func):
+    with map_file(path) as buf:
+        return func(buf)
+
+
+def bench_walk_png(path):
+    _chunks(path, lambda buf: walk_png(buf, check_crc=True))
+
+
+def bench_parse_png(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        parse_png(path, check_crc=True)
+
+
+def bench_search_idat(path, matcher=KeywordMatcher()):
+    _chunks(path, lambda buf: search_idat(list(iter_chunks(buf)), matcher))
+
+
+def bench_process_png(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        process_png(path)
+
+
+def bench_metadata(path):
+    # Formatting inflates every compressed text chunk and ICC profile
+    for entry in read_metadata(path, check_crc=True):
+        format_entry(entry)
+
+
+def _inflated(path):
+    with map_file(path) as buf:
+        data = bytearray()
+        try:
+            for block in IdatInflater().blocks(list(iter_chunks(buf))):
+                data += block
+        except InflateError:
+            pass
+    return bytes(data)
+
+
+def bench_extract_strings(data):
+    for _ in extract_strings(data):
+        pass
+
+
+def bench_carve(path):
+    _chunks(path, carve)
+
+
+def bench_pixel_stats(path):
+    from pixel_stats import file_pixel_stats
+    with map_file(path) as buf:
+        layout = walk_png(buf)
+        try:
+            file_pixel_stats(layout.chunks, layout.ihdr)
+        except (InflateError, ValueError):
+            # Corrupt or truncated images have no complete pixel data
+            pass
+
+
+# name -> (function, what it is fed). 'file' analyzers take a path and are
+# measured against the file size; 'inflated' ones take the inflated IDAT
+# stream and are measured against its size.
+ANALYZERS = {
+    'walk_png': (bench_walk_png, 'file'),
+    'parse_png': (bench_parse_png, 'file'),
+    'metadata': (bench_metadata, 'file'),
+    'search_idat': (bench_search_idat, 'file'),
+    'process_png': (bench_process_png, 'file'),
+    'extract_strings': (bench_extract_strings, 'inflated'),
+    'carve': (bench_carve, 'file'),
+    'pixel_stats': (bench_pixel_stats, 'file'),
+}
+
+
+def load_corpus(corpus_dir):
+    manifest_path = os.path.join(corpus_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        sys.exit(f"No corpus at {corpus_dir}; run python -m benchmarks.corpus first")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return [(os.path.join(corpus_dir, name), category) for name, category in sorted(manifest.items())]
+
+
+def run(func, inputs):
+    """Time func over inputs, then measure its peak heap use in a second pass."""
+    start = time.perf_counter()
+    for item in inputs:
+        func(item)
+    elapsed = time.perf_counter() - start
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            tracemalloc.reset_peak()
+            func(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def measure(corpus, names, by_category=False):
+    groups = {}
+    for path, category in corpus:
+        groups.setdefault(category if by_category else 'all', []).append(path)
+
+    results = {}
+    for name in names:
+        func, feed = ANALYZERS[name]
+        for group, paths in sorted(groups.items()):
+            if feed == 'inflated':
+                inputs = [_inflated(path) for path in paths]
+                size = sum(len(data) for data in inputs)
+            else:
+                inputs = paths
+                size = sum(os.path.getsize(path) for path in paths)
+            elapsed, peak = run(func, inputs)
+            results[f'{name}/{group}'] = {
+                'files': len(paths),
+                'bytes': size,
+                'seconds': elapsed,
+                'mb_per_s': size / elapsed / 1e6 if elapsed else None,
+                'files_per_s': len(paths) / elapsed if elapsed else None,
+                'peak_bytes': peak,
+            }
+    return results
+
+
+def print_table(results, baseline=None):
+    header = f"{'analyzer':<28} {'files':>6} {'MB':>8} {'s':>8} {'MB/s':>9} {'files/s':>9} {'peak MiB':>9}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    for key, r in results.items():
+        line = (f"{key:<28} {r['files']:>6} {r['bytes'] / 1e6:>8.1f} {r['seconds']:>8.3f} "
+                f"{r['mb_per_s'] or 0:>9.1f} {r['files_per_s'] or 0:>9.1f} "
+                f"{r['peak_bytes'] / (1 << 20):>9.2f}")
+        if baseline:
+            old = baseline.get(key)
+            if old and old.get('mb_per_s') and r['mb_per_s']:
+                line += f" {r['mb_per_s'] / old['mb_per_s'] - 1:>+8.0%}"
+            else:
+                line += f" {'-':>8}"
+        print(line)
+
+
+def regressions(results, baseline, tolerance):
+    slower = []
+    for key, r in results.items():
+        old = baseline.get(key)
+        if old and old.get('mb_per_s') and r['mb_per_s']:
+            if r['mb_per_s'] < old['mb_per_s'] * (1 - tolerance):
+                slower.append(key)
+    return slower
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the forensic parsers")
+    parser.add_argument('--corpus', default=DEFAULT_OUT)
+    parser.add_argument('--analyzer', action='append', choices=sorted(ANALYZERS),
+                        help="may be repeated (default: all)")
+    parser.add_argument('--by-category', action='store_true', help="one row per corpus category")
+    parser.add_argument('--save', metavar='NAME', help="save results as a baseline")
+    parser.add_argument('--compare', metavar='NAME', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed MB/s drop before --fail-on-regression trips (default 0.10)")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    names = args.analyzer or list(ANALYZERS)
+    if 'pixel_stats' in names and args.analyzer is None:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            names.remove('pixel_stats')
+
+    corpus = load_corpus(args.corpus)
+    results = measure(corpus, names, args.by_category)
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)['results']
+    print_table(results, baseline)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=1)
+        print(f"Saved baseline to {baseline_path(args.save)}")
+
+    if baseline and args.fail_on_regression:
+        slower = regressions(results, baseline, args.tolerance)
+        if slower:
+            print("Slower than baseline: " + ", ".join(slower), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Generate a synthetic PNG evidence corpus for benchmarking, fully offline.
+
+    python -m benchmarks.corpus [--out DIR] [--scale N] [--seed S]
+
+Categories (counts are multiplied by --scale):
+
+    large      big RGB images
+    many_idat  IDAT split into hundreds of tiny chunks
+    text       megabyte-sized tEXt, zTXt and iTXt chunks
+    appended   a ZIP archive or a second PNG after IEND
+    corrupt    bad CRCs, a zlib stream with a flipped byte, truncation
+    small      many thumbnails, for files/s
+
+A manifest.json next to the files records each file's category.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import struct
+import zipfile
+import zlib
+
+from png_chunks import PNG_SIGNATURE
+
+DEFAULT_OUT = os.path.join(os.path.dirname(__file__), 'corpus')
+
+
+def chunk(chunk_type, data, crc=None):
+    raw_type = chunk_type.encode('latin-1')
+    if crc is None:
+        crc = zlib.crc32(data, zlib.crc32(raw_type))
+    return struct.pack('>I', len(data)) + raw_type + data + struct.pack('>I', crc)
+
+
+def ihdr(width, height, bit_depth=8, color_type=2):
+    return chunk('IHDR', struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0))
+
+
+def scanlines(rng, width, height, channels):
+    """Filtered scanline data: smooth gradients with noisy bands, so it
+    compresses about as well as a photo rather than to nothing."""
+    stride = width * channels
+    ramp = bytes(range(256)) * (stride // 256 + 2)
+    rows = []
+    for y in range(height):
+        if y % 8 < 2:
+            rows.append(b'\x01' + rng.randbytes(stride))
+        else:
+            offset = (y * 7) % 256
+            rows.append(b'\x02' + ramp[offset:offset + stride])
+    return b''.join(rows)
+
+
+def png(rng, width, height, channels=3, idat_size=1 << 16, extra_chunks=(), crc_errors=()):
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    compressed = zlib.compress(scanlines(rng, width, height, channels), 6)
+    parts = [PNG_SIGNATURE, ihdr(width, height, 8, color_type)]
+    parts.extend(extra_chunks)
+    for n, pos in enumerate(range(0, len(compressed), idat_size)):
+        crc = 0xDEADBEEF if n in crc_errors else None
+        parts.append(chunk('IDAT', compressed[pos:pos + idat_size], crc))
+    parts.append(chunk('IEND', b''))
+    return b''.join(parts)
+
+
+def text_chunks(rng, size):
+    words = [b'swimmer', b'flag', b'rain', b'osint', b'lorem', b'ipsum', b'\xe6\x9d\xb1\xe4\xba\xac']
+    body = b' '.join(rng.choice(words) for _ in range(size // 6))[:size]
+    ascii_body = body.replace(b'\xe6\x9d\xb1\xe4\xba\xac', b'tokyo')
+    return [
+        chunk('tEXt', b'Comment\x00' + ascii_body),
+        chunk('zTXt', b'Description\x00\x00' + zlib.compress(ascii_body)),
+        chunk('iTXt', b'Title\x00\x01\x00ja\x00\xe3\x82\xbf\xe3\x82\xa4\xe3\x83\x88\xe3\x83\xab\x00'
+              + zlib.compress(body)),
+    ]
+
+
+def archive(rng, size):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for n in range(8):
+            zf.writestr(f'notes/{n:02d}.txt', rng.randbytes(size // 16) + b'flag{synthetic}' * (size // 256))
+    return buf.getvalue()
+
+
+def generate(out_dir=DEFAULT_OUT, scale=1, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+
+    def write(category, name, data):
+        path = os.path.join(out_dir, f'{category}_{name}.png')
+        with open(path, 'wb') as f:
+            f.write(data)
+        manifest[os.path.basename(path)] = category
+
+    for n in range(2 * scale):
+        write('large', f'{n:03d}', png(rng, 3000, 2000))
+    for n in range(5 * scale):
+        write('many_idat', f'{n:03d}', png(rng, 512, 512, 4, idat_size=256))
+    for n in range(5 * scale):
+        write('text', f'{n:03d}', png(rng, 256, 256, extra_chunks=text_chunks(rng, 1 << 20)))
+    for n in range(5 * scale):
+        host = png(rng, 800, 600)
+        payload = archive(rng, 512 << 10) if n % 2 == 0 else png(rng, 200, 200)
+        write('appended', f'{n:03d}', host + payload)
+    for n in range(5 * scale):
+        data = png(rng, 640, 480, idat_size=8192, crc_errors=(0, 3))
+        if n % 3 == 1:
+            # Flip a byte inside the zlib stream of the second IDAT chunk
+            pos = len(PNG_SIGNATURE) + 25 + 12 + 8192 + 8 + 100
+            data = data[:pos] + bytes([data[pos] ^ 0xFF]) + data[pos + 1:]
+        elif n % 3 == 2:
+            data = data[:len(data) * 2 // 3]
+        write('corrupt', f'{n:03d}', data)
+    for n in range(100 * scale):
+        write('small', f'{n:03d}', png(rng, 64, 64))
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument('--out', default=DEFAULT_OUT)
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate(args.out, args.scale, args.seed)
+    total = sum(os.path.getsize(os.path.join(args.out, name)) for name in manifest)
+    print(f"Wrote {len(manifest)} files, {total / 1e6:.1f} MB to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
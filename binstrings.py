@@ -0,0 +1,134 @@
+import re
+from typing import NamedTuple
+
+# Printable ASCII, same range the original extract_strings loop accepted
+_ASCII = rb'[\x20-\x7e]'
+
+# Well-formed UTF-8: printable ASCII or a complete multibyte sequence
+# (no overlongs, no surrogates). Covers Japanese text in the BMP and beyond.
+_UTF8 = (
+    rb'(?:[\x20-\x7e]'
+    rb'|[\xc2-\xdf][\x80-\xbf]'
+    rb'|\xe0[\xa0-\xbf][\x80-\xbf]'
+    rb'|[\xe1-\xec\xee\xef][\x80-\xbf]{2}'
+    rb'|\xed[\x80-\x9f][\x80-\xbf]'
+    rb'|\xf0[\x90-\xbf][\x80-\xbf]{2}'
+    rb'|[\xf1-\xf3][\x80-\xbf]{3}'
+    rb'|\xf4[\x80-\x8f][\x80-\xbf]{2})'
+)
+
+# encoding name -> (unit pattern, codec, widest unit in bytes, lookahead)
+# The lookahead is a cheap test for the first unit that lets the regex engine
+# reject most start positions before trying the full alternation.
+ENCODINGS = {
+    'ascii': (_ASCII, 'ascii', 1, None),
+    'utf-16le': (_ASCII + rb'\x00', 'utf-16-le', 2, _ASCII + rb'\x00'),
+    'utf-16be': (rb'\x00' + _ASCII, 'utf-16-be', 2, rb'\x00' + _ASCII),
+    'utf-8': (_UTF8, 'utf-8', 4, rb'[\x20-\x7e\xc2-\xf4]'),
+}
+
+# A single run longer than this is flushed even if the block ends inside it,
+# so one pathological run cannot make the carry buffer grow without bound.
+MAX_CARRY = 1 << 20
+
+
+class StringHit(NamedTuple):
+    offset: int
+    encoding: str
+    text: str
+
+
+def compile_pattern(encoding='ascii', min_len=4):
+    unit, _, _, lead = ENCODINGS[encoding]
+    pattern = b'(?:%s){%d,}' % (unit, min_len)
+    if lead:
+        pattern = b'(?=%s)' % lead + pattern
+    return re.compile(pattern)
+
+
+def _hit(encoding, offset, raw):
+    codec = ENCODINGS[encoding][1]
+    text = raw.decode(codec)
+    if encoding == 'utf-8' and text.isascii():
+        encoding = 'ascii'
+    return StringHit(offset, encoding, text)
+
+
+def _normalize(encodings):
+    encodings = tuple(encodings)
+    for encoding in encodings:
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unknown encoding: {encoding}")
+    # Every ASCII run is also a UTF-8 run; scanning both would report it twice
+    if 'utf-8' in encodings:
+        encodings = tuple(e for e in encodings if e != 'ascii')
+    return encodings
+
+
+def iter_strings(data, min_len=4, encodings=('ascii',)):
+    """Yield StringHits for every run of at least min_len characters in data.
+
+    Hits are ordered by encoding, then offset.
+    """
+    for encoding in _normalize(encodings):
+        for m in compile_pattern(encoding, min_len).finditer(data):
+            yield _hit(encoding, m.start(), m.group())
+
+
+class _RunScanner:
+    def __init__(self, encoding, min_len):
+        self.encoding = encoding
+        self.pattern = compile_pattern(encoding, min_len)
+        # Enough bytes to hold a run that is still too short to match plus
+        # a partial multibyte unit
+        self.tail_keep = (min_len + 1) * ENCODINGS[encoding][2]
+        self.carry = b''
+        self.base = 0
+
+    def feed(self, block, final=False):
+        data = self.carry + block if self.carry else bytes(block)
+        hold = len(data) if final else max(0, len(data) - self.tail_keep)
+        hits = []
+        for m in self.pattern.finditer(data):
+            if m.end() > hold:
+                # The run may continue in the next block; rescan it from its start
+                if m.start() < hold:
+                    hold = m.start()
+                break
+            hits.append(_hit(self.encoding, self.base + m.start(), m.group()))
+        if hold == 0 and len(data) > MAX_CARRY:
+            hits.extend(_hit(self.encoding, self.base + m.start(), m.group())
+                        for m in self.pattern.finditer(data))
+            hold = len(data)
+        self.carry = data[hold:]
+        self.base += hold
+        return hits
+
+
+class StringScanner:
+    """Extract strings from a stream of blocks without losing runs that span
+    block boundaries. Offsets are relative to the start of the stream.
+    """
+
+    def __init__(self, min_len=4, encodings=('ascii',)):
+        self._scanners = [_RunScanner(e, min_len) for e in _normalize(encodings)]
+
+    def feed(self, block):
+        return self._collect(block, False)
+
+    def flush(self):
+        return self._collect(b'', True)
+
+    def scan(self, blocks):
+        for block in blocks:
+            yield from self.feed(block)
+        yield from self.flush()
+
+    def _collect(self, block, final):
+        if len(self._scanners) == 1:
+            return self._scanners[0].feed(block, final)
+        hits = []
+        for scanner in self._scanners:
+            hits.extend(scanner.feed(block, final))
+        hits.sort(key=lambda h: h.offset)
+        return hits
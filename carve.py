@@ -0,0 +1,347 @@
+"""Signature-based carving of trailing and embedded payloads.
+
+The file is memory-mapped and searched once for known signatures. For the
+outer container (PNG, JPEG, WebP, ISO-BMFF/AVIF, PDF, ZIP, 7z) the real end
+of the structure is worked out, so bytes appended after it are found even
+when they have no recognisable header. Every piece is written out with an
+extension matching its detected type.
+
+    python carve.py [-o OUTDIR] files...
+"""
+import argparse
+import hashlib
+import os
+import re
+import struct
+import sys
+from typing import NamedTuple
+
+from png_chunks import map_file, walk_png
+
+WRITE_BLOCK = 1 << 20
+
+# kind -> (signature regex, file extension). The regexes are combined into a
+# single pattern so a file is searched only once.
+SIGNATURES = {
+    'png': (rb'\x89PNG\r\n\x1a\n', 'png'),
+    'jpeg': (rb'\xff\xd8\xff[\xc0-\xcf\xdb\xdd\xe0-\xef\xfe]', 'jpg'),
+    'gif': (rb'GIF8[79]a', 'gif'),
+    'webp': (rb'RIFF.{4}WEBPVP8[ LX]', 'webp'),
+    'isobmff': (rb'ftyp[\x20-\x7e]{4}', 'mp4'),
+    'pdf': (rb'%PDF-\d\.\d', 'pdf'),
+    'zip': (rb'PK\x03\x04[\x0a-\x3f]\x00', 'zip'),
+    '7z': (rb"7z\xbc\xaf'\x1c\x00", '7z'),
+    'rar': (rb'Rar!\x1a\x07[\x00\x01]', 'rar'),
+    'gzip': (rb'\x1f\x8b\x08[\x00-\x1f]', 'gz'),
+}
+
+# Bytes between the start of an object and its signature: an ISO-BMFF file
+# opens with the 4-byte size of its ftyp box.
+_SIGNATURE_OFFSET = {'isobmff': 4}
+
+# First byte of every signature above. Checking it in a lookahead lets the
+# regex engine reject almost every offset without trying each alternative.
+_LEADING = rb'[\x89\xffGR%P7\x1ff]'
+
+# ISO-BMFF major brands worth a more specific extension than .mp4
+_BMFF_EXTENSIONS = {b'avif': 'avif', b'avis': 'avif', b'heic': 'heic', b'heix': 'heic',
+                    b'mif1': 'heif', b'qt  ': 'mov', b'crx ': 'cr3'}
+
+_SIGNATURE_RE = re.compile(
+    b'(?=' + _LEADING + b')(?:'
+    + b'|'.join(b'(?P<%s>%s)' % (kind.replace('7z', 'sevenz').encode(), pattern)
+                for kind, (pattern, _) in SIGNATURES.items())
+    + b')',
+    re.DOTALL)
+
+# A JPEG marker inside entropy-coded data: 0xFF followed by anything but
+# byte stuffing (00), a restart marker (D0-D7) or fill (FF)
+_JPEG_MARKER = re.compile(rb'\xff[^\x00\xd0-\xd7\xff]')
+_PDF_EOF = re.compile(rb'%%EOF(?:\r\n|\r|\n)?')
+_ZIP_EOCD = re.compile(rb'PK\x05\x06')
+# Boxes that may appear at the top level of an ISO-BMFF file (MP4, MOV,
+# HEIF/AVIF, CR3, fragmented and segmented variants)
+_BMFF_TOP_LEVEL = frozenset({
+    b'ftyp', b'styp', b'pdin', b'moov', b'moof', b'mfra', b'mdat', b'free', b'skip',
+    b'meta', b'uuid', b'sidx', b'ssix', b'prft', b'emsg', b'meco', b'wide', b'pnot',
+    b'jP  ', b'jp2h', b'jumb', b'junk',
+})
+
+_ARCHIVES = ('zip', '7z')
+
+
+class Piece(NamedTuple):
+    offset: int
+    size: int
+    kind: str | None       # None when no signature matched
+    source: str            # 'container', 'trailing' or 'embedded'
+    note: str | None = None
+
+    @property
+    def extension(self):
+        return extension_for(self.kind)
+
+
+def extension_for(kind):
+    if kind is None:
+        return 'bin'
+    if kind.startswith('isobmff:'):
+        return _BMFF_EXTENSIONS.get(kind[8:].encode('latin-1'), 'mp4')
+    return SIGNATURES[kind][1]
+
+
+def _candidate(m, view):
+    """(object start, kind) for a signature match."""
+    kind = m.lastgroup.replace('sevenz', '7z')
+    start = m.start() - _SIGNATURE_OFFSET.get(kind, 0)
+    if kind == 'isobmff':
+        kind += ':' + bytes(view[m.start() + 4:m.start() + 8]).decode('latin-1')
+    return start, kind
+
+
+def identify(view, offset=0):
+    """Detected kind of the data starting at offset, or None."""
+    for kind, skip in [(None, 0)] + list(_SIGNATURE_OFFSET.items()):
+        m = _SIGNATURE_RE.match(view, offset + skip)
+        if m is not None:
+            start, found = _candidate(m, view)
+            if start == offset and (kind is None or found.split(':')[0] == kind):
+                return found
+    return None
+
+
+# End finders: given a view and the offset where an object of their kind
+# starts, return (end offset or None if unknown, note or None).
+
+def _png_end(view, start):
+    layout = walk_png(view[start:])
+    if layout.truncated:
+        last = layout.chunks[-1] if layout.chunks else None
+        if last is not None and last.truncated:
+            return None, (f"{last.type} chunk at {start + last.offset} overruns the file "
+                          f"by {last.length - len(last.data)} bytes")
+        return None, "no IEND"
+    return start + layout.trailing_offset, None
+
+
+def _jpeg_end(view, start):
+    pos = start + 2
+    size = len(view)
+    while pos + 2 <= size:
+        if view[pos] != 0xFF:
+            return None, f"bad JPEG marker at {pos}"
+        marker = view[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+        elif marker == 0xD9:
+            return pos + 2, None
+        elif 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+        else:
+            if pos + 4 > size:
+                break
+            seg_end = pos + 2 + (view[pos + 2] << 8 | view[pos + 3])
+            if marker != 0xDA:
+                pos = seg_end
+                continue
+            # Start of scan: entropy-coded data runs to the next real marker
+            m = _JPEG_MARKER.search(view, seg_end)
+            if m is None:
+                break
+            pos = m.start()
+    return None, "no EOI"
+
+
+def _riff_end(view, start):
+    riff_size = struct.unpack_from('<I', view, start + 4)[0]
+    end = start + 8 + riff_size + (riff_size & 1)
+    if end > len(view):
+        return None, f"RIFF size {riff_size} overruns the file by {end - len(view)} bytes"
+    return end, None
+
+
+def _bmff_end(view, start):
+    # Only known top-level boxes count: text or an archive appended to the
+    # file would otherwise parse as one more box with a bogus size
+    pos = start
+    size = len(view)
+    while pos + 8 <= size:
+        box_size = struct.unpack_from('>I', view, pos)[0]
+        box_type = bytes(view[pos + 4:pos + 8])
+        if box_type not in _BMFF_TOP_LEVEL:
+            break
+        header = 8
+        if box_size == 1:
+            if pos + 16 > size:
+                break
+            box_size = struct.unpack_from('>Q', view, pos + 8)[0]
+            header = 16
+        elif box_size == 0:
+            # Box extends to the end of the file
+            return size, None
+        if box_size < header:
+            break
+        if pos + box_size > size:
+            note = (f"'{box_type.decode('latin-1')}' box at {pos} overruns the file "
+                    f"by {pos + box_size - size} bytes")
+            # After at least one good box, the rest is reported as trailing data
+            return (pos, note) if pos > start else (None, note)
+        pos += box_size
+    return (pos, None) if pos > start else (None, "no valid boxes")
+
+
+def _pdf_end(view, start, last=False):
+    end = None
+    for m in _PDF_EOF.finditer(view, start):
+        end = m.end()
+        if not last:
+            break
+    return (end, None) if end is not None else (None, "no %%EOF")
+
+
+def _zip_end(view, start):
+    # The end of central directory record is 22 bytes plus a comment
+    for m in _ZIP_EOCD.finditer(view, start):
+        pos = m.start()
+        if pos + 22 <= len(view):
+            comment_len = struct.unpack_from('<H', view, pos + 20)[0]
+            return min(pos + 22 + comment_len, len(view)), None
+    return None, "no end of central directory"
+
+
+def _7z_end(view, start):
+    if start + 32 > len(view):
+        return None, "truncated 7z header"
+    next_offset, next_size = struct.unpack_from('<QQ', view, start + 12)
+    end = start + 32 + next_offset + next_size
+    if end > len(view):
+        return None, f"7z header points {end - len(view)} bytes past the end of the file"
+    return end, None
+
+
+_END_FINDERS = {
+    'png': _png_end,
+    'jpeg': _jpeg_end,
+    'webp': _riff_end,
+    'isobmff': _bmff_end,
+    'pdf': _pdf_end,
+    'zip': _zip_end,
+    '7z': _7z_end,
+}
+
+
+def object_end(view, kind, start=0, outer=False):
+    """Where the object of the given kind starting at start ends.
+
+    For the outer container of a PDF, incremental updates mean the last
+    %%EOF counts rather than the first.
+    """
+    base = kind.split(':')[0] if kind else None
+    if base not in _END_FINDERS:
+        return None, None
+    try:
+        if base == 'pdf':
+            return _pdf_end(view, start, last=outer)
+        return _END_FINDERS[base](view, start)
+    except struct.error:
+        return None, "truncated header"
+
+
+def carve(view):
+    """Find the outer container, anything after its end and embedded objects."""
+    view = memoryview(view)
+    size = len(view)
+    pieces = []
+    kind = identify(view)
+    # Archive members carry their own local headers; don't report them again
+    skip_until = 0
+    if kind is not None:
+        end, note = object_end(view, kind, 0, outer=True)
+        container_end = end if end is not None else size
+        pieces.append(Piece(0, container_end, kind, 'container', note))
+        if kind in _ARCHIVES:
+            skip_until = container_end
+        if container_end < size:
+            trailing = identify(view, end)
+            pieces.append(Piece(end, size - end, trailing, 'trailing'))
+            if trailing in _ARCHIVES:
+                skip_until = object_end(view, trailing, end)[0] or size
+
+    for m in _SIGNATURE_RE.finditer(view, 1):
+        start, embedded = _candidate(m, view)
+        if start < max(skip_until, 1) or any(p.offset == start for p in pieces):
+            continue
+        end, note = object_end(view, embedded, start)
+        if end is None:
+            pieces.append(Piece(start, None, embedded, 'embedded', note))
+            continue
+        pieces.append(Piece(start, end - start, embedded, 'embedded', note))
+        if embedded in _ARCHIVES:
+            skip_until = end
+
+    # Objects with an unknown end run up to the next piece that starts after them
+    starts = sorted({p.offset for p in pieces} | {size})
+    pieces = [p if p.size is not None else
+              p._replace(size=next(s for s in starts if s > p.offset) - p.offset)
+              for p in pieces]
+    return sorted(pieces, key=lambda p: (p.offset, p.source != 'container'))
+
+
+def write_piece(view, piece, out_path):
+    with open(out_path, 'wb') as out_f:
+        for pos in range(piece.offset, piece.offset + piece.size, WRITE_BLOCK):
+            out_f.write(view[pos:min(pos + WRITE_BLOCK, piece.offset + piece.size)])
+
+
+def piece_filename(path, piece):
+    # Evidence from different directories often shares a file name; a short
+    # hash of the source's location keeps their pieces apart in one out_dir
+    tag = hashlib.sha1(os.path.abspath(path).encode('utf-8', 'surrogateescape')).hexdigest()[:8]
+    return f"{os.path.basename(path)}.{tag}.{piece.source}-{piece.offset:08x}.{piece.extension}"
+
+
+def write_pieces(view, pieces, path, out_dir=None):
+    """Write every non-container piece of path into out_dir.
+
+    Returns a list of (piece, output path or None).
+    """
+    results = []
+    for piece in pieces:
+        out_path = None
+        if out_dir is not None and piece.source != 'container':
+            out_path = os.path.join(out_dir, piece_filename(path, piece))
+            write_piece(view, piece, out_path)
+        results.append((piece, out_path))
+    return results
+
+
+def carve_file(path, out_dir=None):
+    with map_file(path) as view:
+        return write_pieces(view, carve(view), path, out_dir)
+
+
+def format_piece(piece, out_path=None):
+    line = (f"{piece.source}: {piece.kind or 'unknown'} at offset {piece.offset}, "
+            f"{piece.size} bytes")
+    if piece.note:
+        line += f" ({piece.note})"
+    if out_path:
+        line += f" -> {out_path}"
+    return line
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Carve trailing and embedded payloads")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('-o', '--out-dir', help="write carved pieces here")
+    args = parser.parse_args()
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    for filepath in args.files:
+        print(f"--- {filepath} ---")
+        try:
+            for piece, out_path in carve_file(filepath, args.out_dir):
+                print(format_piece(piece, out_path))
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
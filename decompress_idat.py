@@ -1,75 +1,188 @@
-import struct
-import glob
+import argparse
 import zlib
-import sys
-import re
+
+from binstrings import ENCODINGS, StringScanner, compile_pattern
+from keywords import KeywordMatcher, PatternError
+from png_chunks import map_file, iter_chunks, parse_ihdr
+
+# Output is handed out in blocks of at most this many bytes, so memory use
+# stays bounded no matter how large the image is.
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Refuse to inflate more than this, whatever IHDR claims.
+DEFAULT_MAX_OUTPUT = 256 << 20
+# How far past the scanline data IHDR implies inflation may run before the
+# stream counts as a bomb. Leaves room for payloads hidden after the pixels.
+EXPECTED_SLACK = 16 << 20
+
+class InflateError(Exception):
+    def __init__(self, message, consumed, produced):
+        super().__init__(message)
+        self.consumed = consumed
+        self.produced = produced
+
+class DecompressionBomb(InflateError):
+    pass
+
+class IdatInflater:
+    """Inflate an IDAT zlib stream incrementally, one chunk at a time.
+
+    consumed/produced track how far the stream got, which is what gets
+    reported when the data turns out to be corrupt.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, max_output=DEFAULT_MAX_OUTPUT):
+        self.block_size = block_size
+        self.max_output = max_output
+        self.consumed = 0
+        self.produced = 0
+        self.unused_size = 0
+        self._d = zlib.decompressobj()
+
+    @property
+    def eof(self):
+        return self._d.eof
+
+    def feed(self, data):
+        if self._d.eof:
+            # Anything after the end of the zlib stream is not pixel data
+            self.unused_size += len(data)
+            return
+        while True:
+            try:
+                out = self._d.decompress(data, self.block_size)
+            except zlib.error as e:
+                raise InflateError(str(e), self.consumed, self.produced) from e
+            self.consumed += len(data) - len(self._d.unconsumed_tail) - len(self._d.unused_data)
+            if out:
+                if self.produced + len(out) > self.max_output:
+                    raise DecompressionBomb(
+                        f"output exceeds {self.max_output} bytes", self.consumed, self.produced)
+                self.produced += len(out)
+                yield out
+            if self._d.eof:
+                self.unused_size += len(self._d.unused_data)
+                return
+            data = self._d.unconsumed_tail
+            # A full block may leave output pending inside zlib even after
+            # all input is consumed, so keep draining until a short block.
+            if not data and len(out) < self.block_size:
+                return
+
+    def blocks(self, chunks):
+        for chunk in chunks:
+            if chunk.type == 'IDAT':
+                yield from self.feed(chunk.data)
+        if not self._d.eof:
+            raise InflateError("incomplete zlib stream", self.consumed, self.produced)
 
 def extract_strings(data, min_len=4):
-    result = ""
-    for b in data:
-        if 32 <= b <= 126:
-            result += chr(b)
-        else:
-            if len(result) >= min_len:
-                yield result
-            result = ""
-    if len(result) >= min_len:
-        yield result
-
-def process_png(filepath):
+    for m in compile_pattern('ascii', min_len).finditer(data):
+        yield m.group().decode('ascii')
+
+def output_limit(max_output, expected_size=None):
+    """Inflation cap: max_output, tightened to what IHDR implies when known."""
+    if expected_size is None:
+        return max_output
+    return min(max_output, expected_size + EXPECTED_SLACK)
+
+def search_idat(chunks, matcher=None, min_len=4, encodings=('ascii',),
+                max_output=DEFAULT_MAX_OUTPUT, sample=11, sink=None, expected_size=None):
+    """Inflate the IDAT chunks and scan them for keywords and strings.
+
+    Returns a dict with the keyword hits, the first `sample` strings, and
+    how far inflation got (including any error). If given, sink is called
+    with every inflated block so callers can reuse the pixel data. With the
+    expected_size from IHDR, output much larger than the image is a bomb.
+    """
+    inflater = IdatInflater(max_output=output_limit(max_output, expected_size))
+    keywords = (matcher or KeywordMatcher()).stream()
+    scanner = StringScanner(min_len, encodings)
+    hits = []
+    strings = []
+    error = None
+    try:
+        for block in inflater.blocks(chunks):
+            if sink is not None:
+                sink(block)
+            hits.extend(keywords.feed(block))
+            # Strings are only a fallback sample, so stop scanning once we have enough
+            if len(strings) < sample:
+                strings.extend(scanner.feed(block))
+        if len(strings) < sample:
+            strings.extend(scanner.flush())
+    except InflateError as e:
+        error = {'message': str(e), 'bomb': isinstance(e, DecompressionBomb)}
+    return {
+        'compressed_size': sum(len(chunk.data) for chunk in chunks if chunk.type == 'IDAT'),
+        'consumed': inflater.consumed,
+        'inflated_size': inflater.produced,
+        'unused_size': inflater.unused_size,
+        'error': error,
+        'keyword_hits': hits,
+        'strings': strings[:sample],
+    }
+
+def process_png(filepath, max_output=DEFAULT_MAX_OUTPUT, min_len=4, encodings=('ascii',), matcher=None):
     print(f"--- Processing {filepath} ---")
-    idat_data = b""
     try:
-        with open(filepath, 'rb') as f:
-            f.read(8) # Signature
-            while True:
-                len_bytes = f.read(4)
-                if not len_bytes: break
-                chunk_len = struct.unpack('>I', len_bytes)[0]
-                chunk_type = f.read(4)
-                if chunk_type == b'IDAT':
-                    idat_data += f.read(chunk_len)
-                else:
-                    f.seek(chunk_len, 1)
-                f.read(4) # CRC
-                if chunk_type == b'IEND': break
-        
-        if not idat_data:
-            print("No IDAT found")
-            return
+        with map_file(filepath) as buf:
+            chunks = list(iter_chunks(buf))
+            if not any(chunk.type == 'IDAT' for chunk in chunks):
+                print("No IDAT found")
+                return
 
-        try:
-            decompressed = zlib.decompress(idat_data)
-            print(f"Decompressed size: {len(decompressed)}")
-            
-            # Look for specific keywords
-            found_keywords = False
-            for s in extract_strings(decompressed):
-                if "swimmer" in s.lower() or "flag" in s.lower() or "ctf" in s.lower() or "rain" in s.lower():
-                    print(f"Found keyword match: {s}")
-                    found_keywords = True
-            
-            if not found_keywords:
-                # print first 10 strings just in case
-                count = 0
-                for s in extract_strings(decompressed):
-                    print(f"String: {s}")
-                    count += 1
-                    if count > 10: break
+            expected = None
+            if chunks[0].type == 'IHDR' and len(chunks[0].data) == 13:
+                expected = parse_ihdr(chunks[0].data).raw_size()
 
-        except Exception as e:
-            print(f"Decompression failed: {e}")
+            # Look for keywords in the raw inflated bytes, keeping the first few strings in case nothing matches
+            result = search_idat(chunks, matcher, min_len, encodings, max_output,
+                                 expected_size=expected)
+            for hit in result['keyword_hits']:
+                print(f"Found keyword match: {hit.pattern} {hit.match!r} (offset {hit.offset})")
+            if result['error'] is None:
+                print(f"Decompressed size: {result['inflated_size']}")
+            else:
+                print(f"Decompression failed after {result['consumed']}/{result['compressed_size']} compressed bytes "
+                      f"({result['inflated_size']} bytes inflated): {result['error']['message']}")
+
+            if expected is not None and result['inflated_size'] > expected:
+                print(f"Inflated {result['inflated_size'] - expected} bytes beyond the {expected} IHDR implies")
+            if result['unused_size']:
+                print(f"{result['unused_size']} bytes of IDAT data after the end of the zlib stream")
+
+            if not result['keyword_hits']:
+                # print first 10 strings just in case
+                for hit in result['strings']:
+                    print(f"String: {hit.text}")
 
     except Exception as e:
         print(f"Error reading file: {e}")
 
-files = [
-    'challenges/swimmer2026/rain/images/tobu_line.png',
-    'challenges/swimmer2026/rain/images/suigun.png', 
-    'challenges/swimmer2026/rain/images/sannnomiya-1.png',
-    'challenges/swimmer2026/rain/images/old-photo.png',
-    'challenges/swimmer2026/rain/images/hokkaido.png'
-]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Search inflated IDAT data for strings")
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-n', '--min-len', type=int, default=4)
+    parser.add_argument('-e', '--encoding', action='append', choices=sorted(ENCODINGS),
+                        help="may be repeated (default: ascii)")
+    parser.add_argument('-k', '--keywords', metavar='FILE',
+                        help="pattern file, one per line (default: swimmer, flag, ctf, rain)")
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher()
+    if args.keywords:
+        try:
+            matcher = KeywordMatcher.from_file(args.keywords)
+        except PatternError as e:
+            parser.error(str(e))
+
+    files = args.files or [
+        'challenges/swimmer2026/rain/images/tobu_line.png',
+        'challenges/swimmer2026/rain/images/suigun.png', 
+        'challenges/swimmer2026/rain/images/sannnomiya-1.png',
+        'challenges/swimmer2026/rain/images/old-photo.png',
+        'challenges/swimmer2026/rain/images/hokkaido.png'
+    ]
 
-for f in files:
-    process_png(f)
+    for f in files:
+        process_png(f, min_len=args.min_len, encodings=args.encoding or ('ascii',), matcher=matcher)
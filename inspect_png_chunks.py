@@ -1,44 +1,53 @@
-import struct
+import argparse
 import glob
-import sys
 import os
 
-def parse_png(filepath):
+from png_chunks import map_file, parse_ihdr
+from png_metadata import Profile, decode_chunk, format_entry, read_layout
+
+def parse_png(filepath, check_crc=False, profile=None):
     print(f"--- {os.path.basename(filepath)} ---")
     try:
-        with open(filepath, 'rb') as f:
-            signature = f.read(8)
-            if signature != b'\x89PNG\r\n\x1a\n':
+        with map_file(filepath) as buf:
+            layout = read_layout(buf, check_crc=check_crc, profile=profile)
+            if not layout.valid_signature:
                 print("Not a valid PNG signature")
                 return
 
-            while True:
-                chunk_len_data = f.read(4)
-                if not chunk_len_data:
+            for chunk in layout.chunks:
+                print(f"Chunk: {chunk.type}, Length: {chunk.length}")
+
+                if chunk.truncated:
+                    print(f"  Truncated at offset {chunk.offset} ({len(chunk.data)}/{chunk.length} bytes present)")
                     break
-                chunk_len = struct.unpack('>I', chunk_len_data)[0]
-                chunk_type = f.read(4).decode('ascii', errors='ignore')
-                
-                print(f"Chunk: {chunk_type}, Length: {chunk_len}")
-                
-                if chunk_type == 'IHDR':
-                    data = f.read(chunk_len)
-                    width, height, bit_depth, color_type, compression, filter_method, interlace = struct.unpack('>IIBBBBB', data)
+                if chunk.crc_ok is False:
+                    print(f"  CRC mismatch at offset {chunk.offset}")
+
+                if chunk.type == 'IHDR':
+                    width, height, bit_depth, color_type, compression, filter_method, interlace = parse_ihdr(chunk.data)
                     print(f"  IHDR: Width={width}, Height={height}, BitDepth={bit_depth}, ColorType={color_type}, Comp={compression}, Filter={filter_method}, Interlace={interlace}")
-                elif chunk_type in ['tEXt', 'zTXt', 'iTXt']:
-                    data = f.read(chunk_len)
-                    print(f"  Data: {data}")
                 else:
-                    f.seek(chunk_len, 1) # Skip data
-                
-                f.read(4) # Skip CRC
-                
-                if chunk_type == 'IEND':
-                    break
+                    entry = decode_chunk(chunk, profile)
+                    if entry is not None:
+                        for line in format_entry(entry):
+                            print(f"  {line}")
+
+            if layout.truncated and not (layout.chunks and layout.chunks[-1].truncated):
+                print("  File ends without IEND")
+            if layout.trailing_size:
+                print(f"  Trailing data: {layout.trailing_size} bytes at offset {layout.trailing_offset}")
     except Exception as e:
         print(f"Error: {e}")
 
-files = glob.glob('challenges/swimmer2026/rain/images/*.png')
-for file in files:
-    parse_png(file)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="List PNG chunks and decode their metadata")
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--profile', action='store_true', help="print per-stage timings for each file")
+    args = parser.parse_args()
 
+    files = args.files or glob.glob('challenges/swimmer2026/rain/images/*.png')
+    for file in files:
+        profile = Profile() if args.profile else None
+        parse_png(file, check_crc=True, profile=profile)
+        if profile is not None:
+            print(f"  Profile: {profile.format()}")
@@ -0,0 +1,202 @@
+import heapq
+import re
+from typing import NamedTuple
+
+# The four indicators decompress_idat used to check by hand
+DEFAULT_KEYWORDS = ('swimmer', 'flag', 'ctf', 'rain')
+
+# Matches spanning more than this many bytes may be missed at block boundaries
+DEFAULT_OVERLAP = 256
+
+_REGEX_PREFIX = 're:'
+
+
+class Pattern(NamedTuple):
+    id: int
+    source: str
+    is_regex: bool
+
+
+class KeywordHit(NamedTuple):
+    offset: int
+    pattern_id: int
+    pattern: str
+    match: bytes
+
+
+class PatternError(ValueError):
+    """A pattern that does not compile; index is its position in the list."""
+
+    def __init__(self, message, index):
+        super().__init__(message)
+        self.index = index
+
+
+def _read_patterns(path):
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            yield lineno, line
+
+
+def load_patterns(path):
+    """Read one pattern per line.
+
+    Blank lines and lines starting with '#' are ignored. A line starting with
+    're:' is a regular expression over bytes, anything else a literal.
+    """
+    return [line for _, line in _read_patterns(path)]
+
+
+def _trie_regex(node):
+    # node maps a byte to its child node; the None key marks the end of a literal
+    branches = [re.escape(bytes([key])) + _trie_regex(node[key])
+                for key in sorted(k for k in node if k is not None)]
+    if not branches:
+        return b''
+    body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+    if None in node:
+        # Greedy, so the longest literal through this node wins
+        body = b'(?:' + body + b')?'
+    return body
+
+
+class KeywordMatcher:
+    """Match many patterns against raw bytes in a single pass.
+
+    Literals are folded into a trie-shaped regex, so the engine walks one
+    automaton per offset no matter how many literals there are. Regular
+    expression patterns are searched one by one, so inline flags, group
+    names and backreferences behave as they would on their own. Every hit
+    is reported, including overlapping ones and several patterns starting
+    at the same offset.
+    """
+
+    def __init__(self, patterns=DEFAULT_KEYWORDS, ignore_case=True, encodings=('utf-8',)):
+        self.patterns = []
+        self.ignore_case = ignore_case
+        flags = re.IGNORECASE if ignore_case else 0
+        self._literals = {}     # encoded (folded) literal -> [pattern id]
+        self._regexes = []      # (pattern id, compiled)
+        for source in patterns:
+            is_regex = source.startswith(_REGEX_PREFIX)
+            pattern = Pattern(len(self.patterns), source, is_regex)
+            self.patterns.append(pattern)
+            if is_regex:
+                try:
+                    compiled = re.compile(source[len(_REGEX_PREFIX):].encode('utf-8'), flags)
+                except re.error as e:
+                    raise PatternError(f"invalid regex {source!r}: {e}", pattern.id) from e
+                self._regexes.append((pattern.id, compiled))
+                continue
+            for encoding in encodings:
+                key = source.encode(encoding)
+                if ignore_case:
+                    key = key.lower()
+                if key:
+                    ids = self._literals.setdefault(key, [])
+                    if pattern.id not in ids:
+                        ids.append(pattern.id)
+
+        # For each literal, the shorter literals that are its prefixes: when
+        # the automaton reports the longest match at an offset, these matched
+        # there too.
+        lengths = sorted({len(k) for k in self._literals})
+        self._prefixes = {
+            key: [key[:n] for n in lengths if n <= len(key) and key[:n] in self._literals]
+            for key in self._literals
+        }
+
+        self._longest_literal = max(lengths, default=0)
+        self._literal_re = None
+        if self._literals:
+            trie = {}
+            for key in self._literals:
+                node = trie
+                for b in key:
+                    node = node.setdefault(b, {})
+                node[None] = True
+            # The leading byte class lets the engine skip offsets that cannot
+            # start any literal before descending into the trie. Literals are
+            # matched case-sensitively against folded data: bytes.lower() is
+            # far cheaper than re.IGNORECASE on every comparison.
+            first = bytes(sorted({key[0] for key in self._literals}))
+            self._literal_re = re.compile(
+                b'(?=[' + re.escape(first) + b'])(?=(' + _trie_regex(trie) + b'))')
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        lines = list(_read_patterns(path))
+        try:
+            return cls([line for _, line in lines], **kwargs)
+        except PatternError as e:
+            raise PatternError(f"{path}:{lines[e.index][0]}: {e}", e.index) from e
+
+    def scan(self, data, base=0, start=0):
+        """Yield every hit in data, with offsets shifted by base.
+
+        Hits that end at or before start are skipped; scan_blocks uses this
+        to avoid reporting a hit twice. Hits come out grouped by kind
+        (literals, then regexes), each group in offset order.
+        """
+        if self._literal_re is not None:
+            # bytes() is a no-op for bytes and copies views, which have no lower()
+            haystack = bytes(data).lower() if self.ignore_case else data
+            for m in self._literal_re.finditer(haystack):
+                pos = m.start()
+                for key in self._prefixes[bytes(m.group(1))]:
+                    end = pos + len(key)
+                    if end <= start:
+                        continue
+                    for pattern_id in self._literals[key]:
+                        yield KeywordHit(base + pos, pattern_id, self.patterns[pattern_id].source,
+                                         bytes(data[pos:end]))
+        if self._regexes:
+            # Each regex runs alone; merging keeps the regex hits in offset order
+            yield from heapq.merge(*(self._regex_hits(pattern_id, compiled, data, base, start)
+                                     for pattern_id, compiled in self._regexes))
+
+    def _regex_hits(self, pattern_id, compiled, data, base, start):
+        pos = 0
+        while True:
+            m = compiled.search(data, pos)
+            if m is None:
+                return
+            pos = m.start()
+            # Restarting one byte later, rather than after the match, reports
+            # overlapping matches as the literal automaton does
+            if m.end() > max(pos, start):
+                yield KeywordHit(base + pos, pattern_id, self.patterns[pattern_id].source,
+                                 bytes(m.group()))
+            pos += 1
+
+    def stream(self, overlap=DEFAULT_OVERLAP):
+        return KeywordStream(self, overlap)
+
+    def scan_blocks(self, blocks, overlap=DEFAULT_OVERLAP):
+        """Scan a stream of blocks; offsets are relative to the stream start."""
+        stream = self.stream(overlap)
+        for block in blocks:
+            yield from stream.feed(block)
+
+
+class KeywordStream:
+    """Feed blocks one at a time. The last overlap bytes of each block are
+    rescanned with the next one so hits across a boundary are not lost.
+    """
+
+    def __init__(self, matcher, overlap=DEFAULT_OVERLAP):
+        self.matcher = matcher
+        self.overlap = max(overlap, matcher._longest_literal - 1)
+        self._tail = b''
+        self._base = 0
+
+    def feed(self, block):
+        data = self._tail + block if self._tail else block
+        hits = list(self.matcher.scan(data, self._base, len(self._tail)))
+        keep = min(self.overlap, len(data))
+        self._tail = bytes(data[len(data) - keep:])
+        self._base += len(data) - keep
+        return hits
@@ -0,0 +1,259 @@
+"""Pixel-level statistics for LSB steganography triage.
+
+The inflated IDAT stream is unfiltered with NumPy using the IHDR bit depth
+and colour type, then each channel's least significant bits are summarised:
+
+- lsb_ones / lsb_entropy: share of set LSBs and their Shannon entropy.
+- chi2 / chi2_p: the Westfeld-Pfitzmann pairs-of-values test. Embedding
+  random bits in the LSBs evens out the counts of 2k and 2k+1, so a p-value
+  close to 1 is suspicious and one close to 0 looks like an untouched image.
+
+NumPy is optional for the rest of the tools; only this module needs it.
+"""
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from decompress_idat import DEFAULT_MAX_OUTPUT, IdatInflater, output_limit
+from png_chunks import ADAM7, CHANNELS, map_file, walk_png
+
+CHANNEL_NAMES = {
+    0: ('gray',),
+    2: ('r', 'g', 'b'),
+    3: ('index',),
+    4: ('gray', 'alpha'),
+    6: ('r', 'g', 'b', 'alpha'),
+}
+
+# Rows unfiltered per wavefront pass; bounds the skewed work array to about
+# BAND * (BAND + width) pixels.
+BAND = 1024
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("pixel statistics need numpy (pip install numpy)")
+
+
+def _unfilter_band(data, filters, prev):
+    """Undo PNG filtering for a band of rows.
+
+    data is (rows, width, bpp) filtered bytes, prev the reconstructed row
+    above the band. Sub, Average and Paeth depend on the pixel to the left
+    and the row above, so rows cannot be done independently; instead the
+    band is skewed so every anti-diagonal becomes a column and each step
+    reconstructs one anti-diagonal with whole-array operations.
+    """
+    h, w, bpp = data.shape
+    # skew[y + 1, y + x + 2] holds pixel (y, x); row 0 is the previous row
+    # and the zeros around it are the PNG "outside the image" neighbours.
+    skew = np.zeros((h + 1, h + w + 1, bpp), np.int16)
+    filt = np.zeros((h, h + w + 1, bpp), np.int16)
+    skew[0, 1:w + 1] = prev
+    for y in range(h):
+        filt[y, y + 2:y + 2 + w] = data[y]
+    kinds = filters.astype(np.int16)[:, None]
+    has_avg = bool((filters == 3).any())
+    has_paeth = bool((filters == 4).any())
+
+    for d in range(h + w - 1):
+        lo = max(0, d - w + 1)
+        hi = min(h - 1, d) + 1
+        c = d + 2
+        a = skew[lo + 1:hi + 1, c - 1]     # left
+        b = skew[lo:hi, c - 1]             # up
+        kind = kinds[lo:hi]
+        pred = np.where(kind == 1, a, 0)
+        pred = np.where(kind == 2, b, pred)
+        if has_avg:
+            pred = np.where(kind == 3, (a + b) >> 1, pred)
+        if has_paeth:
+            ul = skew[lo:hi, c - 2]        # upper left
+            p = a + b - ul
+            pa = np.abs(p - a)
+            pb = np.abs(p - b)
+            pc = np.abs(p - ul)
+            paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, ul))
+            pred = np.where(kind == 4, paeth, pred)
+        skew[lo + 1:hi + 1, c] = (filt[lo:hi, c] + pred) & 0xFF
+
+    out = np.empty((h, w, bpp), np.uint8)
+    for y in range(h):
+        out[y] = skew[y + 1, y + 2:y + 2 + w]
+    return out
+
+
+def unfilter(raw, ihdr):
+    """Reconstruct the scanlines of one (sub)image.
+
+    Returns a (height, row_bytes) uint8 array.
+    """
+    _require_numpy()
+    stride = ihdr.row_bytes()
+    bpp = max(1, ihdr.bits_per_pixel // 8)
+    rows = np.frombuffer(raw, np.uint8, count=ihdr.height * (stride + 1))
+    rows = rows.reshape(ihdr.height, stride + 1)
+    filters = rows[:, 0]
+    if filters.size and filters.max() > 4:
+        raise ValueError(f"invalid filter type {int(filters.max())}")
+    data = rows[:, 1:].reshape(ihdr.height, stride // bpp, bpp)
+
+    out = np.empty_like(data)
+    prev = np.zeros(data.shape[1:], np.uint8)
+    for y0 in range(0, ihdr.height, BAND):
+        out[y0:y0 + BAND] = _unfilter_band(data[y0:y0 + BAND], filters[y0:y0 + BAND], prev)
+        prev = out[min(y0 + BAND, ihdr.height) - 1]
+    return out.reshape(ihdr.height, stride)
+
+
+def _samples(lines, ihdr):
+    """(pixels, channels) array of sample values from unfiltered scanlines."""
+    channels = CHANNELS[ihdr.color_type]
+    per_row = ihdr.width * channels
+    if ihdr.bit_depth == 16:
+        values = lines.view('>u2')[:, :per_row]
+    elif ihdr.bit_depth == 8:
+        values = lines[:, :per_row]
+    else:
+        bits = np.unpackbits(lines, axis=1).reshape(ihdr.height, -1, ihdr.bit_depth)
+        weights = 1 << np.arange(ihdr.bit_depth - 1, -1, -1)
+        values = (bits * weights).sum(axis=2)[:, :per_row]
+    return values.reshape(-1, channels)
+
+
+def _passes(raw, ihdr):
+    """Yield (sub-IHDR, raw bytes) for each non-empty pass of the image."""
+    if not ihdr.interlace:
+        yield ihdr, raw
+        return
+    pos = 0
+    for x0, y0, dx, dy in ADAM7:
+        w = (ihdr.width - x0 + dx - 1) // dx if ihdr.width > x0 else 0
+        h = (ihdr.height - y0 + dy - 1) // dy if ihdr.height > y0 else 0
+        if not (w and h):
+            continue
+        sub = ihdr._replace(width=w, height=h, interlace=0)
+        size = h * (1 + sub.row_bytes())
+        yield sub, raw[pos:pos + size]
+        pos += size
+
+
+def chi2_sf(x, df):
+    """Survival function of the chi-square distribution (regularized Q(df/2, x/2))."""
+    if df <= 0:
+        return float('nan')
+    if x <= 0:
+        return 1.0
+    a = df / 2.0
+    x = x / 2.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for P(a, x)
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Continued fraction for Q(a, x)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, h * math.exp(log_prefix))
+
+
+def channel_stats(values, bit_depth):
+    lsb = values & 1
+    total = int(values.size)
+    ones = int(lsb.sum())
+    p = ones / total if total else 0.0
+    entropy = 0.0
+    for q in (p, 1 - p):
+        if q > 0:
+            entropy -= q * math.log2(q)
+
+    hist = np.bincount(values.astype(np.int64), minlength=1 << bit_depth).astype(np.float64)
+    even, odd = hist[0::2], hist[1::2]
+    expected = (even + odd) / 2
+    used = expected > 0
+    chi2 = float((((even - expected) ** 2)[used] / expected[used]).sum())
+    df = int(used.sum()) - 1
+    return {
+        'samples': total,
+        'lsb_ones': p,
+        'lsb_entropy': entropy,
+        'chi2': chi2,
+        'chi2_df': df,
+        'chi2_p': chi2_sf(chi2, df) if df > 0 else None,
+    }
+
+
+def pixel_stats(raw, ihdr):
+    """Per-channel LSB statistics for an inflated IDAT stream."""
+    _require_numpy()
+    if ihdr.color_type not in CHANNELS or ihdr.bit_depth not in (1, 2, 4, 8, 16):
+        raise ValueError(f"unsupported colour type {ihdr.color_type} / bit depth {ihdr.bit_depth}")
+    parts = [_samples(unfilter(data, sub), sub) for sub, data in _passes(raw, ihdr)]
+    samples = np.concatenate(parts) if len(parts) > 1 else parts[0]
+    names = CHANNEL_NAMES[ihdr.color_type]
+    channels = {name: channel_stats(samples[:, i], ihdr.bit_depth) for i, name in enumerate(names)}
+    p_values = [c['chi2_p'] for c in channels.values() if c['chi2_p'] is not None]
+    return {
+        'channels': channels,
+        # The most suspicious channel decides the ranking
+        'stego_score': max(p_values) if p_values else None,
+    }
+
+
+def inflate_raw(chunks, ihdr, max_output=DEFAULT_MAX_OUTPUT):
+    """Inflate IDAT into one buffer holding exactly the scanlines IHDR describes."""
+    expected = ihdr.raw_size()
+    raw = bytearray()
+    for block in IdatInflater(max_output=output_limit(max_output, expected)).blocks(chunks):
+        raw += block
+    if len(raw) < expected:
+        raise ValueError(f"IDAT inflates to {len(raw)} bytes, IHDR needs {expected}")
+    # Anything past the scanlines is not pixel data
+    del raw[expected:]
+    return raw
+
+
+def file_pixel_stats(chunks, ihdr, max_output=DEFAULT_MAX_OUTPUT):
+    return pixel_stats(inflate_raw(chunks, ihdr, max_output), ihdr)
+
+
+if __name__ == '__main__':
+    for filepath in sys.argv[1:]:
+        print(f"--- {filepath} ---")
+        try:
+            with map_file(filepath) as buf:
+                layout = walk_png(buf)
+                if layout.ihdr is None:
+                    print("Not a PNG with IHDR")
+                    continue
+                stats = file_pixel_stats(layout.chunks, layout.ihdr)
+            for name, c in stats['channels'].items():
+                p = 'n/a' if c['chi2_p'] is None else f"{c['chi2_p']:.4f}"
+                print(f"  {name:>5}: LSB ones={c['lsb_ones']:.4f} entropy={c['lsb_entropy']:.4f} "
+                      f"chi2={c['chi2']:.1f} (df={c['chi2_df']}) p={p}")
+        except Exception as e:
+            print(f"Error: {e}")
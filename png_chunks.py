@@ -0,0 +1,173 @@
+import mmap
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG limits chunk lengths to 2**31 - 1; anything larger means we are not
+# looking at a chunk header any more.
+MAX_CHUNK_LEN = 0x7FFFFFFF
+
+_HEADER = struct.Struct('>I4s')
+_CRC = struct.Struct('>I')
+_IHDR = struct.Struct('>IIBBBBB')
+
+# Samples per pixel for each PNG colour type
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Adam7 passes as (x start, y start, x step, y step)
+ADAM7 = (
+    (0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4),
+    (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2),
+)
+
+
+class Chunk(NamedTuple):
+    offset: int            # file offset of the length field
+    length: int            # declared data length
+    type: str
+    data: memoryview       # zero-copy view, shorter than length if truncated
+    crc: int | None        # stored CRC, None if the file ends before it
+    crc_ok: bool | None    # None unless CRC checking was requested
+    truncated: bool
+
+    @property
+    def data_offset(self):
+        return self.offset + 8
+
+    @property
+    def end(self):
+        return self.offset + 12 + self.length
+
+
+class Ihdr(NamedTuple):
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+    compression: int
+    filter_method: int
+    interlace: int
+
+    @property
+    def bits_per_pixel(self):
+        return CHANNELS.get(self.color_type, 0) * self.bit_depth
+
+    def row_bytes(self, width=None):
+        width = self.width if width is None else width
+        return (width * self.bits_per_pixel + 7) // 8
+
+    def raw_size(self):
+        """Size of the filtered scanline data a well-formed IDAT stream inflates to."""
+        if not self.interlace:
+            return self.height * (1 + self.row_bytes())
+        total = 0
+        for x0, y0, dx, dy in ADAM7:
+            w = (self.width - x0 + dx - 1) // dx if self.width > x0 else 0
+            h = (self.height - y0 + dy - 1) // dy if self.height > y0 else 0
+            if w and h:
+                total += h * (1 + self.row_bytes(w))
+        return total
+
+
+def parse_ihdr(data):
+    return Ihdr(*_IHDR.unpack(data))
+
+
+class PngLayout(NamedTuple):
+    size: int
+    valid_signature: bool
+    chunks: list
+    trailing_offset: int | None   # first byte after IEND, None if no IEND
+    truncated: bool
+
+    @property
+    def ihdr(self):
+        if self.chunks and self.chunks[0].type == 'IHDR' and len(self.chunks[0].data) == _IHDR.size:
+            return parse_ihdr(self.chunks[0].data)
+        return None
+
+    @property
+    def trailing_size(self):
+        if self.trailing_offset is None:
+            return 0
+        return self.size - self.trailing_offset
+
+
+@contextmanager
+def map_file(filepath):
+    """Map a file read-only and yield a memoryview over it.
+
+    Views handed out by iter_chunks point into the mapping, so they are only
+    valid inside the with-block.
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # mmap refuses zero-length files
+            yield memoryview(b'')
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mm.close()
+            except BufferError:
+                # A caller still holds a chunk view; the mapping is closed
+                # once that view is garbage collected.
+                pass
+
+
+def iter_chunks(buf, check_crc=False, start=len(PNG_SIGNATURE)) -> Iterator[Chunk]:
+    """Yield chunks from a PNG buffer, stopping after IEND or at truncation.
+
+    The signature is not checked here; use walk_png for that.
+    """
+    view = memoryview(buf)
+    size = len(view)
+    pos = start
+    while pos + _HEADER.size <= size:
+        length, raw_type = _HEADER.unpack_from(view, pos)
+        if length > MAX_CHUNK_LEN:
+            break
+        chunk_type = raw_type.decode('latin-1')
+        data_start = pos + 8
+        data_end = data_start + length
+        data = view[data_start:min(data_end, size)]
+        if data_end + _CRC.size > size:
+            yield Chunk(pos, length, chunk_type, data, None, None, True)
+            return
+        crc = _CRC.unpack_from(view, data_end)[0]
+        crc_ok = None
+        if check_crc:
+            crc_ok = zlib.crc32(data, zlib.crc32(raw_type)) == crc
+        yield Chunk(pos, length, chunk_type, data, crc, crc_ok, False)
+        pos = data_end + _CRC.size
+        if chunk_type == 'IEND':
+            return
+
+
+def walk_png(buf, check_crc=False):
+    """Parse the whole chunk table of a PNG buffer into a PngLayout."""
+    view = memoryview(buf)
+    size = len(view)
+    if view[:len(PNG_SIGNATURE)] != PNG_SIGNATURE:
+        return PngLayout(size, False, [], None, False)
+
+    chunks = list(iter_chunks(view, check_crc=check_crc))
+    trailing_offset = None
+    truncated = False
+    if chunks and chunks[-1].truncated:
+        truncated = True
+    elif chunks and chunks[-1].type == 'IEND':
+        trailing_offset = chunks[-1].end
+    else:
+        # Ran out of bytes between chunks, or hit a bogus length field
+        truncated = True
+    return PngLayout(size, True, chunks, trailing_offset, truncated)
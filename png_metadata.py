@@ -0,0 +1,491 @@
+"""In-process decoding of PNG ancillary chunks: tEXt, zTXt, iTXt, eXIf,
+tIME, pHYs and iCCP.
+
+Compressed payloads (zTXt, compressed iTXt, iCCP) are copied out of the
+file but only inflated when their text or profile is first accessed, so
+listing keywords or timestamps across a directory costs no inflation.
+
+Pass a Profile to record the time and bytes spent per stage:
+
+    read     mapping the file and walking the chunk table
+    crc      checking chunk CRCs
+    inflate  decompressing text and ICC profiles (counted on access)
+    decode   parsing chunk fields
+
+    python png_metadata.py [--profile] files...
+"""
+import argparse
+import struct
+import sys
+import time
+import zlib
+from contextlib import contextmanager, nullcontext
+from functools import cached_property
+from typing import NamedTuple
+
+from decompress_idat import DecompressionBomb, InflateError
+from png_chunks import map_file, walk_png
+
+# Upper bound on inflated text or ICC profile data per chunk
+MAX_INFLATED = 16 << 20
+# Upper bound on inflated text kept per file by entry_records
+MAX_FILE_TEXT = 16 << 20
+# Characters of text format_record prints before eliding the rest
+TEXT_PREVIEW = 200
+
+STAGES = ('read', 'crc', 'inflate', 'decode')
+
+
+class Profile:
+    """Accumulated seconds and input bytes per stage."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = dict.fromkeys(STAGES, 0)
+
+    @contextmanager
+    def stage(self, name, nbytes=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.bytes[name] += nbytes
+
+    def merge(self, other):
+        for name in STAGES:
+            self.seconds[name] += other.seconds[name]
+            self.bytes[name] += other.bytes[name]
+
+    def format(self):
+        return ", ".join(f"{name} {self.seconds[name] * 1e3:.2f} ms / {self.bytes[name]} B"
+                         for name in STAGES)
+
+
+def _stage(profile, name, nbytes=0):
+    return profile.stage(name, nbytes) if profile is not None else nullcontext()
+
+
+def inflate(data, profile=None, limit=MAX_INFLATED):
+    if limit <= 0:
+        # zlib treats a max_length of 0 as unlimited
+        raise DecompressionBomb("no inflation budget left", 0, 0)
+    with _stage(profile, 'inflate', len(data)):
+        d = zlib.decompressobj()
+        try:
+            out = d.decompress(data, limit)
+        except zlib.error as e:
+            raise InflateError(str(e), len(data) - len(d.unused_data), 0) from e
+        if d.unconsumed_tail:
+            raise DecompressionBomb(f"inflated data exceeds {limit} bytes",
+                                    len(data) - len(d.unconsumed_tail), len(out))
+        if not d.eof:
+            raise InflateError("incomplete zlib stream", len(data), len(out))
+    return out
+
+
+class TextChunk:
+    """A tEXt, zTXt or iTXt entry; compressed text is inflated on first access."""
+
+    def __init__(self, chunk_type, keyword, raw, compressed=False, language='',
+                 translated_keyword='', profile=None):
+        self.type = chunk_type
+        self.keyword = keyword
+        self.raw = raw                  # stored bytes, still compressed if compressed
+        self.compressed = compressed
+        self.language = language
+        self.translated_keyword = translated_keyword
+        self._profile = profile
+
+    @cached_property
+    def text(self):
+        return self.read_text()
+
+    def read_text(self, limit=MAX_INFLATED):
+        """The text, inflating at most limit bytes."""
+        if 'text' in self.__dict__:
+            return self.text
+        data = inflate(self.raw, self._profile, limit) if self.compressed else self.raw
+        # tEXt and zTXt are Latin-1; iTXt is UTF-8
+        if self.type == 'iTXt':
+            return data.decode('utf-8', errors='replace')
+        return data.decode('latin-1')
+
+    def __repr__(self):
+        return f"TextChunk({self.type}, {self.keyword!r}, compressed={self.compressed})"
+
+
+class IccProfile:
+    """An iCCP profile name; the profile itself is inflated on first access."""
+
+    def __init__(self, name, raw, profile=None):
+        self.name = name
+        self.raw = raw
+        self._profile = profile
+
+    @cached_property
+    def data(self):
+        return inflate(self.raw, self._profile)
+
+    @property
+    def header(self):
+        """Device class, colour space and PCS from the ICC header."""
+        data = self.data
+        if len(data) < 128:
+            raise ValueError(f"ICC profile is only {len(data)} bytes")
+        return {
+            'size': struct.unpack_from('>I', data)[0],
+            'device_class': data[12:16].decode('latin-1').strip(),
+            'color_space': data[16:20].decode('latin-1').strip(),
+            'pcs': data[20:24].decode('latin-1').strip(),
+        }
+
+    def __repr__(self):
+        return f"IccProfile({self.name!r})"
+
+
+class Time(NamedTuple):
+    year: int
+    month: int
+    day: int
+    hour: int
+    minute: int
+    second: int
+
+    def __str__(self):
+        return "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}Z".format(*self)
+
+
+class Phys(NamedTuple):
+    x: int
+    y: int
+    unit: int              # 1 = metre, 0 = aspect ratio only
+
+    @property
+    def dpi(self):
+        if self.unit != 1:
+            return None
+        return round(self.x * 0.0254, 2), round(self.y * 0.0254, 2)
+
+
+def _split_keyword(data):
+    """(keyword, rest) for the NUL-terminated keyword that opens a chunk."""
+    nul = data.find(b'\x00')
+    if nul < 0:
+        raise ValueError("keyword is not NUL-terminated")
+    return data[:nul].decode('latin-1'), data[nul + 1:]
+
+
+def decode_text(data, profile=None):
+    keyword, text = _split_keyword(data)
+    return TextChunk('tEXt', keyword, text, profile=profile)
+
+
+def decode_ztxt(data, profile=None):
+    keyword, rest = _split_keyword(data)
+    if not rest or rest[0] != 0:
+        raise ValueError(f"unknown zTXt compression method {rest[:1].hex() or 'missing'}")
+    return TextChunk('zTXt', keyword, rest[1:], compressed=True, profile=profile)
+
+
+def decode_itxt(data, profile=None):
+    keyword, rest = _split_keyword(data)
+    if len(rest) < 2:
+        raise ValueError("iTXt is missing its compression fields")
+    flag, method = rest[0], rest[1]
+    if flag and method != 0:
+        raise ValueError(f"unknown iTXt compression method {method}")
+    fields = rest[2:].split(b'\x00', 2)
+    if len(fields) < 3:
+        raise ValueError("iTXt language or translated keyword is not NUL-terminated")
+    language, translated, text = fields
+    return TextChunk('iTXt', keyword, text, compressed=bool(flag),
+                     language=language.decode('latin-1'),
+                     translated_keyword=translated.decode('utf-8', errors='replace'),
+                     profile=profile)
+
+
+def decode_time(data, profile=None):
+    return Time(*struct.unpack('>HBBBBB', data))
+
+
+def decode_phys(data, profile=None):
+    return Phys(*struct.unpack('>IIB', data))
+
+
+def decode_iccp(data, profile=None):
+    name, rest = _split_keyword(data)
+    if not rest or rest[0] != 0:
+        raise ValueError(f"unknown iCCP compression method {rest[:1].hex() or 'missing'}")
+    return IccProfile(name, rest[1:], profile)
+
+
+# Tags worth naming; the rest are reported by number
+EXIF_TAGS = {
+    0x010E: 'ImageDescription', 0x010F: 'Make', 0x0110: 'Model', 0x0112: 'Orientation',
+    0x011A: 'XResolution', 0x011B: 'YResolution', 0x0128: 'ResolutionUnit',
+    0x0131: 'Software', 0x0132: 'DateTime', 0x013B: 'Artist', 0x8298: 'Copyright',
+    0x829A: 'ExposureTime', 0x829D: 'FNumber', 0x8827: 'ISOSpeedRatings',
+    0x9003: 'DateTimeOriginal', 0x9004: 'DateTimeDigitized', 0x9010: 'OffsetTime',
+    0x9011: 'OffsetTimeOriginal', 0x920A: 'FocalLength', 0x9286: 'UserComment',
+    0xA002: 'PixelXDimension', 0xA003: 'PixelYDimension', 0xA420: 'ImageUniqueID',
+    0xA430: 'CameraOwnerName', 0xA431: 'BodySerialNumber', 0xA433: 'LensMake',
+    0xA434: 'LensModel',
+}
+GPS_TAGS = {
+    0x0000: 'GPSVersionID', 0x0001: 'GPSLatitudeRef', 0x0002: 'GPSLatitude',
+    0x0003: 'GPSLongitudeRef', 0x0004: 'GPSLongitude', 0x0005: 'GPSAltitudeRef',
+    0x0006: 'GPSAltitude', 0x0007: 'GPSTimeStamp', 0x0011: 'GPSImgDirection',
+    0x001D: 'GPSDateStamp',
+}
+_EXIF_IFD = 0x8769
+_GPS_IFD = 0x8825
+
+# TIFF field type -> (struct code, size)
+_TIFF_TYPES = {
+    1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 5: ('II', 8), 6: ('b', 1),
+    7: ('s', 1), 8: ('h', 2), 9: ('i', 4), 10: ('ii', 8), 11: ('f', 4), 12: ('d', 8),
+    13: ('I', 4),
+}
+# Types a sub-IFD pointer may legitimately have: LONG and IFD
+_POINTER_TYPES = (4, 13)
+_MAX_IFD_ENTRIES = 1024
+
+
+def _tiff_value(data, endian, field_type, count, value_offset, entry_pos):
+    code, size = _TIFF_TYPES[field_type]
+    total = size * count
+    # Values of up to four bytes are stored in the entry itself
+    pos = entry_pos + 8 if total <= 4 else value_offset
+    if pos + total > len(data):
+        raise ValueError(f"EXIF value at {pos} runs past the end of the chunk")
+    if code == 's':
+        raw = bytes(data[pos:pos + total])
+        return raw.rstrip(b'\x00').decode('utf-8', errors='replace') if field_type == 2 else raw
+    values = struct.unpack_from(f'{endian}{count * code}', data, pos)
+    if field_type in (5, 10):
+        values = tuple(n / d if d else None for n, d in zip(values[::2], values[1::2]))
+    return values[0] if count == 1 else values
+
+
+def _read_ifd(data, endian, offset, names, out, seen):
+    if offset in seen or offset + 2 > len(data):
+        return
+    seen.add(offset)
+    count = struct.unpack_from(endian + 'H', data, offset)[0]
+    for n in range(min(count, _MAX_IFD_ENTRIES)):
+        entry = offset + 2 + 12 * n
+        if entry + 12 > len(data):
+            break
+        tag, field_type, value_count, value_offset = struct.unpack_from(endian + 'HHII', data, entry)
+        if field_type not in _TIFF_TYPES:
+            continue
+        try:
+            value = _tiff_value(data, endian, field_type, value_count, value_offset, entry)
+        except (ValueError, struct.error):
+            continue
+        # Only follow a pointer that is a single offset; anything else is
+        # recorded as-is so hostile data cannot derail the walk
+        is_pointer = isinstance(value, int) and field_type in _POINTER_TYPES
+        if tag == _EXIF_IFD and names is EXIF_TAGS and is_pointer:
+            _read_ifd(data, endian, value, EXIF_TAGS, out, seen)
+        elif tag == _GPS_IFD and names is EXIF_TAGS and is_pointer:
+            _read_ifd(data, endian, value, GPS_TAGS, out, seen)
+        else:
+            out[names.get(tag, f'0x{tag:04x}' if names is EXIF_TAGS else f'GPS 0x{tag:04x}')] = value
+
+
+def _gps_degrees(dms, ref):
+    if not isinstance(dms, tuple) or len(dms) != 3 or None in dms:
+        return None
+    degrees = dms[0] + dms[1] / 60 + dms[2] / 3600
+    return -degrees if ref in ('S', 'W') else degrees
+
+
+def decode_exif(data, profile=None):
+    """Tag name -> value for IFD0, the Exif IFD and the GPS IFD.
+
+    When GPS coordinates are present, 'latitude' and 'longitude' hold them in
+    signed decimal degrees.
+    """
+    data = bytes(data)
+    if data[:4] == b'II*\x00':
+        endian = '<'
+    elif data[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        raise ValueError("eXIf does not start with a TIFF header")
+    tags = {}
+    _read_ifd(data, endian, struct.unpack_from(endian + 'I', data, 4)[0], EXIF_TAGS, tags, set())
+    latitude = _gps_degrees(tags.get('GPSLatitude'), tags.get('GPSLatitudeRef'))
+    longitude = _gps_degrees(tags.get('GPSLongitude'), tags.get('GPSLongitudeRef'))
+    if latitude is not None and longitude is not None:
+        tags['latitude'] = latitude
+        tags['longitude'] = longitude
+    return tags
+
+
+DECODERS = {
+    'tEXt': decode_text,
+    'zTXt': decode_ztxt,
+    'iTXt': decode_itxt,
+    'eXIf': decode_exif,
+    'tIME': decode_time,
+    'pHYs': decode_phys,
+    'iCCP': decode_iccp,
+}
+
+
+class Entry(NamedTuple):
+    type: str
+    offset: int
+    value: object          # decoded value, None if decoding failed
+    error: str | None = None
+
+
+def decode_chunk(chunk, profile=None):
+    """Decode one ancillary chunk into an Entry, or None if it is not one we know.
+
+    The value never refers to the chunk's memoryview, so it stays usable after
+    the file is unmapped. A chunk that fails to decode becomes an Entry with
+    an error, so one malformed chunk never hides the rest of the file.
+    """
+    decoder = DECODERS.get(chunk.type)
+    if decoder is None or chunk.truncated:
+        return None
+    with _stage(profile, 'decode', len(chunk.data)):
+        try:
+            return Entry(chunk.type, chunk.offset, decoder(bytes(chunk.data), profile))
+        except Exception as e:
+            return Entry(chunk.type, chunk.offset, None, f"{type(e).__name__}: {e}")
+
+
+def read_layout(buf, check_crc=False, profile=None):
+    """walk_png with the chunk walk and the CRC checks timed as separate stages.
+
+    The file is mapped lazily, so page faults land in whichever stage touches
+    the bytes first; with check_crc that is the crc stage.
+    """
+    with _stage(profile, 'read', len(buf)):
+        layout = walk_png(buf)
+    if check_crc:
+        checked = []
+        with _stage(profile, 'crc', sum(len(c.data) for c in layout.chunks)):
+            for c in layout.chunks:
+                if c.crc is not None:
+                    c = c._replace(crc_ok=zlib.crc32(c.data, zlib.crc32(c.type.encode('latin-1'))) == c.crc)
+                checked.append(c)
+        layout = layout._replace(chunks=checked)
+    return layout
+
+
+def read_metadata(filepath, check_crc=False, profile=None):
+    """Decoded ancillary chunks of a PNG file, in file order."""
+    with map_file(filepath) as buf:
+        layout = read_layout(buf, check_crc, profile)
+        entries = [decode_chunk(c, profile) for c in layout.chunks]
+    return [e for e in entries if e is not None]
+
+
+def entry_record(entry, limit=MAX_INFLATED):
+    """Plain, picklable fields of an Entry; inflates compressed payloads.
+
+    Compressed text is inflated up to limit bytes. A payload that fails to
+    inflate or parse keeps the fields read so far and sets 'error'.
+    """
+    record = {'type': entry.type, 'offset': entry.offset, 'error': entry.error}
+    value = entry.value
+    if entry.error:
+        return record
+    try:
+        if isinstance(value, TextChunk):
+            record.update(keyword=value.keyword, compressed=value.compressed,
+                          language=value.language, translated_keyword=value.translated_keyword)
+            record['text'] = value.read_text(limit)
+        elif isinstance(value, IccProfile):
+            record['name'] = value.name
+            record.update(value.header)
+        elif isinstance(value, Time):
+            record['time'] = str(value)
+        elif isinstance(value, Phys):
+            record.update(value._asdict(), dpi=value.dpi)
+        elif entry.type == 'eXIf':
+            record['tags'] = value
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def entry_records(entries, budget=MAX_FILE_TEXT):
+    """entry_record for each entry, keeping at most budget bytes of inflated
+    text across all of them so one file cannot fill a worker's memory."""
+    records = []
+    for entry in entries:
+        limit = min(MAX_INFLATED, budget)
+        record = entry_record(entry, limit)
+        if limit < MAX_INFLATED and (record['error'] or '').startswith('DecompressionBomb'):
+            record['error'] += f" (file limit of {MAX_FILE_TEXT} bytes of text)"
+        if record.get('compressed') and 'text' in record:
+            budget -= len(record['text'])
+        records.append(record)
+    return records
+
+
+def format_record(record):
+    """Human-readable lines for an entry_record."""
+    chunk_type = record['type']
+    label = chunk_type
+    if 'keyword' in record:
+        label += f" {record['keyword']!r}"
+        if record['language'] or record['translated_keyword']:
+            label += f" [{record['language']}] {record['translated_keyword']!r}"
+    elif 'name' in record:
+        label += f" {record['name']!r}"
+    if record['error']:
+        return [f"{label}: undecodable ({record['error']})"]
+    if 'text' in record:
+        text = record['text']
+        if len(text) > TEXT_PREVIEW:
+            return [f"{label}: {text[:TEXT_PREVIEW]!r}... ({len(text)} chars)"]
+        return [f"{label}: {text!r}"]
+    if chunk_type == 'iCCP':
+        return [f"{label}: {record['size']} bytes, {record['device_class']} "
+                f"{record['color_space']} -> {record['pcs']}"]
+    if chunk_type == 'tIME':
+        return [f"tIME: {record['time']}"]
+    if chunk_type == 'pHYs':
+        line = f"pHYs: {record['x']}x{record['y']} per {'metre' if record['unit'] == 1 else 'unit'}"
+        if record['dpi']:
+            line += f" ({record['dpi'][0]}x{record['dpi'][1]} dpi)"
+        return [line]
+    if chunk_type == 'eXIf':
+        return [f"eXIf {name}: {v!r}" for name, v in record['tags'].items()]
+    return [f"{chunk_type}: {record!r}"]
+
+
+def format_entry(entry):
+    """Human-readable lines for an Entry; inflates compressed payloads."""
+    return format_record(entry_record(entry))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Decode PNG metadata chunks")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--profile', action='store_true', help="print per-stage timings")
+    args = parser.parse_args()
+
+    total = Profile()
+    for filepath in args.files:
+        print(f"--- {filepath} ---")
+        profile = Profile() if args.profile else None
+        try:
+            for entry in read_metadata(filepath, check_crc=True, profile=profile):
+                for line in format_entry(entry):
+                    print(f"  {line}")
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+        if profile is not None:
+            print(f"  Profile: {profile.format()}")
+            total.merge(profile)
+    if args.profile and len(args.files) > 1:
+        print(f"Total: {total.format()}")
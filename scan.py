@@ -0,0 +1,335 @@
+"""Batch-scan evidence trees: payload carving, PNG chunk inspection and
+IDAT string search for every file, spread over a process pool.
+
+    python scan.py                      # challenges/**/evidence and **/images
+    python scan.py path/to/dir file.png -j 8 -k keywords.example.txt
+    python scan.py --pixel-stats --jsonl results.jsonl   # one JSON record per file
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from carve import carve, format_piece, piece_filename, write_pieces
+from decompress_idat import DEFAULT_MAX_OUTPUT, search_idat
+from keywords import DEFAULT_KEYWORDS, KeywordMatcher, PatternError, load_patterns
+from pixel_stats import pixel_stats as compute_pixel_stats
+from png_chunks import map_file, walk_png
+from png_metadata import decode_chunk, entry_records, format_record
+from scan_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ScanCache
+
+# Bump whenever analyze_file's output changes so cached results are not reused
+ANALYZER_VERSION = '6'
+
+DEFAULT_ROOTS = ('challenges/**/evidence', 'challenges/**/images')
+
+# Per-process state, set up once by _init_worker rather than pickled per task
+_options = {}
+
+
+def collect_files(paths):
+    """Expand files, directories and glob patterns into a list of regular files."""
+    seen = set()
+    files = []
+    for path in paths:
+        matches = glob.glob(path, recursive=True) if glob.has_magic(path) else [path]
+        for match in matches:
+            if os.path.isdir(match):
+                candidates = (os.path.join(root, name)
+                              for root, _, names in os.walk(match) for name in sorted(names))
+            else:
+                candidates = [match]
+            for candidate in candidates:
+                real = os.path.realpath(candidate)
+                if real not in seen and os.path.isfile(candidate):
+                    seen.add(real)
+                    files.append(candidate)
+    return files
+
+
+def _pixel_sink(raw, expected):
+    """Sink for search_idat that keeps only the first expected bytes in raw."""
+    def sink(block):
+        room = expected - len(raw)
+        if room > 0:
+            raw.extend(block[:room])
+    return sink
+
+
+def analyze_file(path, matcher=None, min_len=4, encodings=('ascii',),
+                 max_output=DEFAULT_MAX_OUTPUT, extract_dir=None, pixel_stats=False):
+    result = {'path': path, 'size': os.path.getsize(path), 'png': False}
+    with map_file(path) as buf:
+        # (piece, output path or None) for the container, trailing and embedded data
+        result['pieces'] = write_pieces(buf, carve(buf), path, extract_dir)
+
+        layout = walk_png(buf, check_crc=True)
+        if not layout.valid_signature:
+            return result
+        ihdr = layout.ihdr
+        result.update({
+            'png': True,
+            'ihdr': ihdr._asdict() if ihdr else None,
+            'chunks': [(c.type, c.offset, c.length, c.crc_ok) for c in layout.chunks],
+            # Decoded ancillary chunks, compressed text inflated up to MAX_FILE_TEXT
+            'metadata': entry_records(e for e in map(decode_chunk, layout.chunks) if e is not None),
+            'truncated': layout.truncated,
+            'trailing_offset': layout.trailing_offset,
+            'trailing_size': layout.trailing_size,
+            'idat': None,
+            'pixel_stats': None,
+        })
+        if any(c.type == 'IDAT' for c in layout.chunks):
+            expected = ihdr.raw_size() if ihdr is not None else None
+            raw = bytearray() if pixel_stats and ihdr is not None else None
+            result['idat'] = search_idat(layout.chunks, matcher, min_len, encodings, max_output,
+                                         sink=_pixel_sink(raw, expected) if raw is not None else None,
+                                         expected_size=expected)
+            if ihdr is not None:
+                result['idat']['expected_size'] = expected
+            if raw is not None:
+                if result['idat']['error'] is None and len(raw) == expected:
+                    try:
+                        result['pixel_stats'] = compute_pixel_stats(raw, ihdr)
+                    except (RuntimeError, ValueError) as e:
+                        result['pixel_stats'] = {'error': str(e)}
+                else:
+                    result['pixel_stats'] = {'error': "IDAT did not inflate to a full image"}
+    return result
+
+
+def _init_worker(options):
+    options = dict(options)
+    patterns = options.pop('patterns', DEFAULT_KEYWORDS)
+    _options.clear()
+    _options.update(options, matcher=KeywordMatcher(patterns))
+
+
+def _run(path):
+    try:
+        return analyze_file(path, **_options)
+    except Exception as e:
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def format_result(result):
+    lines = [f"--- {result['path']} ---"]
+    if 'error' in result:
+        lines.append(f"Error: {result['error']}")
+        return lines
+    for piece, out_path in result['pieces']:
+        lines.append(format_piece(piece, out_path))
+    if not result['png']:
+        return lines
+    ihdr = result['ihdr']
+    if ihdr:
+        lines.append("IHDR: {width}x{height}, BitDepth={bit_depth}, ColorType={color_type}, "
+                     "Interlace={interlace}".format(**ihdr))
+    counts = {}
+    for chunk_type, offset, length, crc_ok in result['chunks']:
+        counts[chunk_type] = counts.get(chunk_type, 0) + 1
+        if crc_ok is False:
+            lines.append(f"CRC mismatch: {chunk_type} at offset {offset}")
+    lines.append("Chunks: " + ", ".join(f"{t}x{n}" if n > 1 else t for t, n in counts.items()))
+    for record in result['metadata']:
+        lines.extend(format_record(record))
+    if result['truncated']:
+        lines.append("Truncated: file ends before IEND")
+
+    idat = result['idat']
+    if idat is not None:
+        if idat['error']:
+            lines.append(f"Decompression failed after {idat['consumed']}/{idat['compressed_size']} "
+                         f"compressed bytes ({idat['inflated_size']} inflated): {idat['error']['message']}")
+        expected = idat.get('expected_size')
+        if expected is not None and idat['inflated_size'] > expected:
+            lines.append(f"Inflated {idat['inflated_size'] - expected} bytes beyond the {expected} IHDR implies")
+        if idat['unused_size']:
+            lines.append(f"{idat['unused_size']} bytes of IDAT data after the end of the zlib stream")
+        for hit in idat['keyword_hits']:
+            lines.append(f"Keyword: {hit.pattern} {hit.match!r} (IDAT offset {hit.offset})")
+
+    stats = result.get('pixel_stats')
+    if stats is not None:
+        if 'error' in stats:
+            lines.append(f"Pixel stats: {stats['error']}")
+        else:
+            for name, c in stats['channels'].items():
+                p = 'n/a' if c['chi2_p'] is None else f"{c['chi2_p']:.4f}"
+                lines.append(f"LSB {name}: ones={c['lsb_ones']:.4f} entropy={c['lsb_entropy']:.4f} "
+                             f"chi2 p={p}")
+    return lines
+
+
+def _jsonable(obj):
+    if hasattr(obj, '_asdict'):
+        obj = obj._asdict()
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8', errors='backslashreplace')
+    return obj
+
+
+def to_records(result, chunk_records=False):
+    """JSON-ready records for a result: one per file, optionally one per chunk."""
+    record = {'record': 'file'}
+    record.update(result)
+    record['pieces'] = [dict(piece._asdict(), extension=piece.extension, output=out_path)
+                        for piece, out_path in result.get('pieces', [])]
+    chunks = [{'type': t, 'offset': offset, 'length': length, 'crc_ok': crc_ok}
+              for t, offset, length, crc_ok in result.get('chunks') or []]
+    if 'chunks' in result:
+        record['chunks'] = chunks
+    yield _jsonable(record)
+    if chunk_records:
+        for chunk in chunks:
+            yield {'record': 'chunk', 'path': result['path'], **chunk}
+
+
+def cache_options(options):
+    """The subset of scan options that changes analysis results."""
+    options = {k: v for k, v in options.items() if k != 'extract_dir'}
+    if 'patterns' in options:
+        options['patterns'] = tuple(options['patterns'])
+    return options
+
+
+def _from_cache(cache, sha256, path, extract_dir):
+    result = cache.get(sha256)
+    if result is None:
+        return None
+    pieces = []
+    for piece, _ in result['pieces']:
+        out_path = None
+        if extract_dir is not None and piece.source != 'container':
+            # Carving is a side effect; redo the work if its output is gone
+            out_path = os.path.join(extract_dir, piece_filename(path, piece))
+            if not os.path.exists(out_path):
+                return None
+        pieces.append((piece, out_path))
+    return dict(result, path=path, pieces=pieces)
+
+
+def _analyze(files, jobs, ordered, options):
+    if jobs == 1:
+        _init_worker(options)
+        for path in files:
+            yield _run(path)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(options,)) as executor:
+        futures = [executor.submit(_run, path) for path in files]
+        yield from (f.result() for f in (futures if ordered else as_completed(futures)))
+
+
+def scan(files, jobs=None, ordered=False, cache=None, **options):
+    """Analyze files largest-first and yield results.
+
+    Results come out as workers finish unless ordered is set, in which case
+    they follow the order of files. With a ScanCache, cached results are
+    yielded first and only the remaining files are analyzed. Files are
+    matched on content: unknown or changed paths are hashed (far cheaper
+    than analysis) so copies and touched files still hit.
+    """
+    files = sorted(files, key=os.path.getsize, reverse=True)
+    pending = files
+    digests = {}
+    if cache is not None:
+        pending = []
+        for path in files:
+            try:
+                sha256 = cache.digest(path)
+            except OSError:
+                pending.append(path)
+                continue
+            digests[path] = sha256
+            result = _from_cache(cache, sha256, path, options.get('extract_dir'))
+            if result is None:
+                pending.append(path)
+            else:
+                yield result
+    for result in _analyze(pending, jobs, ordered, options):
+        sha256 = digests.get(result['path'])
+        if sha256 is not None and 'error' not in result:
+            cache.put(sha256, result)
+        yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan evidence files in parallel")
+    parser.add_argument('paths', nargs='*', help="files, directories or globs "
+                        f"(default: {' '.join(DEFAULT_ROOTS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes (default: CPU count, 1 runs in-process)")
+    parser.add_argument('-k', '--keywords', metavar='FILE', help="keyword pattern file")
+    parser.add_argument('-n', '--min-len', type=int, default=4)
+    parser.add_argument('-x', '--extract-dir', metavar='DIR',
+                        help="save trailing and embedded payloads into DIR")
+    parser.add_argument('--ordered', action='store_true',
+                        help="print results largest-first instead of as they finish")
+    parser.add_argument('--cache', metavar='PATH', default=DEFAULT_CACHE_PATH,
+                        help=f"result cache database (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--cache-size', type=int, metavar='MB', default=DEFAULT_MAX_BYTES >> 20,
+                        help="evict least recently used results beyond this size")
+    parser.add_argument('--no-cache', action='store_true', help="analyze every file from scratch")
+    parser.add_argument('--pixel-stats', action='store_true',
+                        help="unfilter PNG pixels and compute LSB statistics (needs numpy)")
+    parser.add_argument('--jsonl', metavar='PATH',
+                        help="write JSON Lines records to PATH ('-' for stdout instead of text)")
+    parser.add_argument('--chunk-records', action='store_true',
+                        help="with --jsonl, also write one record per PNG chunk")
+    args = parser.parse_args(argv)
+
+    patterns = DEFAULT_KEYWORDS
+    if args.keywords:
+        # Compile once here so a bad line is reported before any worker starts
+        try:
+            KeywordMatcher.from_file(args.keywords)
+        except PatternError as e:
+            parser.error(str(e))
+        patterns = load_patterns(args.keywords)
+
+    files = collect_files(args.paths or DEFAULT_ROOTS)
+    if not files:
+        print("No files found", file=sys.stderr)
+        return 1
+    if args.extract_dir:
+        os.makedirs(args.extract_dir, exist_ok=True)
+
+    options = {
+        'patterns': patterns,
+        'min_len': args.min_len,
+        'extract_dir': args.extract_dir,
+        'pixel_stats': args.pixel_stats,
+    }
+    cache = None
+    if not args.no_cache:
+        cache = ScanCache(args.cache, ANALYZER_VERSION, cache_options(options),
+                          max_bytes=args.cache_size << 20)
+    jsonl = None
+    if args.jsonl:
+        jsonl = sys.stdout if args.jsonl == '-' else open(args.jsonl, 'w', encoding='utf-8')
+    try:
+        for result in scan(files, jobs=args.jobs, ordered=args.ordered, cache=cache, **options):
+            if jsonl is not None:
+                for record in to_records(result, args.chunk_records):
+                    jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+                jsonl.flush()
+            if jsonl is not sys.stdout:
+                print("\n".join(format_result(result)), flush=True)
+    finally:
+        if jsonl is not None and jsonl is not sys.stdout:
+            jsonl.close()
+        if cache is not None:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+            cache.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
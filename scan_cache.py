@@ -0,0 +1,135 @@
+"""Persistent cache of scan results keyed on file content.
+
+Results are stored per (sha256, analyzer version, options fingerprint), so
+renamed or copied evidence is still a hit and a change to the analyzers or
+keyword list is a miss. A (path, size, mtime) table lets unchanged files
+skip hashing altogether.
+
+The cache holds pickled results; only point it at a database you created.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = '.osint_cache/scan.sqlite'
+DEFAULT_MAX_BYTES = 256 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    sha256 TEXT NOT NULL,
+    version TEXT NOT NULL,
+    options TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (sha256, version, options)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def fingerprint(options):
+    """Stable digest of the options that affect analysis results."""
+    return hashlib.sha256(repr(sorted(options.items())).encode('utf-8')).hexdigest()[:16]
+
+
+class ScanCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, version='', options=None,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.version = str(version)
+        self.options = fingerprint(options or {})
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self.evict()
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, path):
+        """(stored sha256 or None, stat result) for path.
+
+        Only stats the file; a None digest means it is new or has changed
+        and must be hashed, after which record() stores the hash.
+        """
+        st = os.stat(path)
+        row = self._db.execute(
+            "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (os.path.realpath(path), st.st_size, st.st_mtime_ns)).fetchone()
+        return (row[0] if row else None), st
+
+    def record(self, path, st, sha256):
+        """Remember the content hash of path as of the stat result st."""
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                         (os.path.realpath(path), st.st_size, st.st_mtime_ns, sha256))
+
+    def digest(self, path):
+        """Content hash of path, reusing the stored one if size and mtime are unchanged."""
+        sha256, st = self.lookup(path)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+            self.record(path, st, sha256)
+        return sha256
+
+    def get(self, sha256):
+        row = self._db.execute(
+            "SELECT data FROM results WHERE sha256 = ? AND version = ? AND options = ?",
+            (sha256, self.version, self.options)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute(
+            "UPDATE results SET last_used = ? WHERE sha256 = ? AND version = ? AND options = ?",
+            (time.time(), sha256, self.version, self.options))
+        return pickle.loads(row[0])
+
+    def put(self, sha256, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                         (sha256, self.version, self.options, data, len(data), time.time()))
+
+    def evict(self):
+        """Drop least recently used results until the total fits in max_bytes."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        rows = self._db.execute(
+            "SELECT sha256, version, options, size FROM results ORDER BY last_used").fetchall()
+        for sha256, version, options, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute(
+                "DELETE FROM results WHERE sha256 = ? AND version = ? AND options = ?",
+                (sha256, version, options))
+            total -= size
+            removed += 1
+        # Forget hashes nothing refers to any more; they are cheap to recompute
+        self._db.execute(
+            "DELETE FROM files WHERE sha256 NOT IN (SELECT sha256 FROM results)")
+        return removed